@@ -2,14 +2,61 @@ from __future__ import annotations
 from udapi.core.document import Document
 from udapi.core.node import Node
 
+import sys
+
 from typing import Iterator, Tuple, List, Literal, Union
+from collections import Counter
 
+from bisect import bisect_left
+from functools import lru_cache
 from math import log2, sqrt
 
 from utils import StringBuildable
 
 from pydantic import BaseModel, Field
 
+# interned UPOS constants shared by all filters, so hot comparisons hit the
+# identity fast path instead of character-wise equality
+UPOS_PUNCT = sys.intern('PUNCT')
+UPOS_VERB = sys.intern('VERB')
+UPOS_ADJ = sys.intern('ADJ')
+
+# caches per-document node materializations so that composite metrics (CLI, ARI, FRE, ...)
+# don't re-walk the whole document for every sub-metric they are built from;
+# safe as long as metrics are computed before rules modify the document (cf. server.py)
+# The cache lives on the document itself — the cached nodes reference their document,
+# so an external (weak-keyed) mapping would keep every document alive forever.
+
+
+def get_cached_nodes(doc: Document, filter_punct: bool) -> List[Node]:
+    if (doc_cache := getattr(doc, '_ponk_node_cache', None)) is None:
+        doc_cache = doc._ponk_node_cache = {}
+    if (nodes := doc_cache.get(filter_punct)) is None:
+        if filter_punct:
+            nodes = Metric.filter_nodes_on_punct(get_cached_nodes(doc, False))
+        else:
+            nodes = list(doc.nodes)
+        doc_cache[filter_punct] = nodes
+    return nodes
+
+
+def count_sentences(doc: Document) -> int:
+    return len(doc.bundles)
+
+
+def count_words(doc: Document, filter_punct: bool = True) -> int:
+    return len(get_cached_nodes(doc, filter_punct))
+
+
+def count_characters(doc: Document, filter_punct: bool = True, count_spaces: bool = False) -> int:
+    nodes = get_cached_nodes(doc, filter_punct)
+    return sum(len(node.form) for node in nodes) + \
+        (len(nodes) if count_spaces else 0)  # TODO:fix this via reading mics
+
+
+def count_syllables(doc: Document, filter_punct: bool = True) -> int:
+    return sum(Metric.get_syllables_in_word(node.form) for node in get_cached_nodes(doc, filter_punct))
+
 
 class Metric(StringBuildable):
     """
@@ -20,23 +67,20 @@ class Metric(StringBuildable):
 
     @staticmethod
     def get_word_counts(nodes: List[Node], use_lemma=False,
-                        from_to: Tuple[int, int] | None = None) -> dict[str, int]:
+                        from_to: Tuple[int, int] | None = None) -> Counter[str]:
         if from_to:
             nodes = nodes[from_to[0]:from_to[1]]
-        all_words = Metric.get_node_texts(nodes, use_lemma)
-        return Metric.count_occurrences_of_unique_texts(all_words)
+        # count straight off the nodes instead of materializing a list of texts first
+        return Counter((node.lemma if use_lemma else node.form) for node in nodes)
 
     @staticmethod
-    def count_occurrences_of_unique_texts(node_texts: List[str]):
-        result = {}
-        for text in node_texts:
-            if result.get(text) is None:
-                result[text] = 1
-            else:
-                result[text] += 1
-        return result
+    def count_occurrences_of_unique_texts(node_texts: List[str]) -> Counter[str]:
+        # Counter tallies in C, unlike a hand-rolled dict loop
+        return Counter(node_texts)
+
     @staticmethod
     def filter_nodes_on_upos(nodes: Iterator[Node], values: List[str], negative=False) -> List[Node]:
+        values = values if isinstance(values, frozenset) else frozenset(values)
         return [node for node in nodes if ((node.upos in values) != negative)]
 
     @staticmethod
@@ -45,7 +89,8 @@ class Metric(StringBuildable):
 
     @staticmethod
     def filter_nodes_on_punct(nodes: Iterator[Node]):
-        return Metric.negative_filter_nodes_on_upos(nodes, ['PUNCT'])
+        # specialized: by far the most common filter, no need for set membership
+        return [node for node in nodes if node.upos != UPOS_PUNCT]
 
     @staticmethod
     def get_node_texts(nodes: Iterator[Node], use_lemma=False) -> List[str]:
@@ -54,14 +99,16 @@ class Metric(StringBuildable):
     @staticmethod
     def get_syllables_in_word(word: str) -> int:
         # FIXME: eeeeeh
-        return sum([word.count(vocal) for vocal in ('a', 'e', 'i', 'o', 'u', 'y')])
+        # single C-level pass instead of one word.count() scan per vowel
+        counts = Counter(word)
+        return counts['a'] + counts['e'] + counts['i'] + counts['o'] + counts['u'] + counts['y']
 
 
 class MetricPunctExcluding(Metric):
     filter_punct: bool = Field(default=True, description="Boolean controlling whether to exclude punctuation from the count.")
 
     def get_applicable_nodes(self, doc: Document) -> List[Node]:
-        return self.filter_nodes_on_punct(doc.nodes) if self.filter_punct else doc.nodes
+        return get_cached_nodes(doc, self.filter_punct)
 
 
 class MetricSentenceCount(Metric):
@@ -71,7 +118,7 @@ class MetricSentenceCount(Metric):
     metric_id: Literal['sent_count'] = 'sent_count'
 
     def apply(self, doc: Document) -> float:
-        return len(doc.bundles)
+        return count_sentences(doc)
 
 
 class MetricWordCount(MetricPunctExcluding):
@@ -81,7 +128,7 @@ class MetricWordCount(MetricPunctExcluding):
     metric_id: Literal['word_count'] = 'word_count'
 
     def apply(self, doc: Document) -> float:
-        return len(self.get_applicable_nodes(doc))
+        return count_words(doc, self.filter_punct)
 
 
 class MetricSyllableCount(MetricPunctExcluding):
@@ -91,7 +138,7 @@ class MetricSyllableCount(MetricPunctExcluding):
     metric_id: Literal['syllab_count'] = 'syllab_count'
 
     def apply(self, doc: Document) -> float:
-        return sum(Metric.get_syllables_in_word(node.form) for node in self.get_applicable_nodes(doc))
+        return count_syllables(doc, self.filter_punct)
 
 
 class MetricCharacterCount(MetricPunctExcluding):
@@ -102,9 +149,7 @@ class MetricCharacterCount(MetricPunctExcluding):
     count_spaces: bool = Field(default=False, description="Boolean controlling whether to include spaces in the count.")
 
     def apply(self, doc: Document) -> float:
-        filtered_nodes = self.get_applicable_nodes(doc)
-        return sum(len(node.form) for node in filtered_nodes) + \
-            (len(filtered_nodes) if self.count_spaces else 0)  # TODO:fix this via reading mics
+        return count_characters(doc, self.filter_punct, self.count_spaces)
 
 
 class MetricCLI(MetricPunctExcluding):
@@ -126,9 +171,9 @@ class MetricCLI(MetricPunctExcluding):
     const_1: float = 12.9
 
     def apply(self, doc: Document) -> float:
-        sents = MetricSentenceCount().apply(doc)
-        words = MetricWordCount(filter_punct=self.filter_punct).apply(doc)
-        chars = MetricCharacterCount(count_spaces=self.count_spaces, filter_punct=self.filter_punct).apply(doc)
+        sents = count_sentences(doc)
+        words = count_words(doc, self.filter_punct)
+        chars = count_characters(doc, self.filter_punct, self.count_spaces)
         return (self.coef_1 * (chars / words) * 100) - (self.coef_2 * (sents / words) * 100) - self.const_1
 
 
@@ -151,9 +196,9 @@ class MetricARI(MetricPunctExcluding):
     const_1: float = 19.49
 
     def apply(self, doc: Document) -> float:
-        sents = MetricSentenceCount().apply(doc)
-        words = MetricWordCount(filter_punct=self.filter_punct).apply(doc)
-        chars = MetricCharacterCount(count_spaces=self.count_spaces, filter_punct=self.filter_punct).apply(doc)
+        sents = count_sentences(doc)
+        words = count_words(doc, self.filter_punct)
+        chars = count_characters(doc, self.filter_punct, self.count_spaces)
         return self.coef_1 * (chars / words) + self.coef_2 * (words / sents) - self.const_1
 
 
@@ -165,8 +210,8 @@ class MetricHapaxCount(MetricPunctExcluding):
     use_lemma: bool = Field(default=True, description="Boolean controlling whether lemma should be used instead of word form for the calculation.")
 
     def apply(self, doc: Document) -> float:
-        counts = list(self.get_word_counts(self.get_applicable_nodes(doc), self.use_lemma).values())
-        return counts.count(1)
+        counts = self.get_word_counts(self.get_applicable_nodes(doc), self.use_lemma).values()
+        return sum(1 for count in counts if count == 1)
 
 
 class MetricEntropy(MetricPunctExcluding):
@@ -179,8 +224,11 @@ class MetricEntropy(MetricPunctExcluding):
     def apply(self, doc: Document) -> float:
         counts = self.get_word_counts(self.get_applicable_nodes(doc), self.use_lemma).values()
         n_words = sum(counts)
-        probs = map(lambda x: x / n_words, counts)
-        return -sum(prob * log2(prob) for prob in probs)
+        if not n_words:
+            # e.g. an all-punctuation document; log2(0) would raise
+            return 0
+        # -sum((c/n) * log2(c/n)) == log2(n) - sum(c * log2(c)) / n, saves a division per type
+        return log2(n_words) - sum(count * log2(count) for count in counts) / n_words
 
 
 class MetricTTR(MetricPunctExcluding):
@@ -206,15 +254,15 @@ class MetricVerbDistance(Metric):
         last_verb_index = 0
         total_distance = 0
         verbs = 0
-        nodes = list(doc.nodes)
+        node_count = 0
         # FIXME: iterate over trees
-        for i in range(len(nodes)):
-            node = nodes[i]
-            if node.upos == 'VERB' and (self.include_inf or node.feats['VerbForm'] == 'Fin'):
+        for i, node in enumerate(get_cached_nodes(doc, False)):
+            node_count += 1
+            if node.upos == UPOS_VERB and (self.include_inf or node.feats['VerbForm'] == 'Fin'):
                 total_distance += max(0, (i - last_verb_index - 1))
                 last_verb_index = i
                 verbs += 1
-        total_distance += len(nodes) - last_verb_index
+        total_distance += node_count - last_verb_index
         return total_distance / max(1, verbs)
 
 
@@ -225,9 +273,13 @@ class MetricActivity(Metric):
     metric_id: Literal['activity'] = 'activity'
 
     def apply(self, doc: Document) -> float:
-        nodes = list(doc.nodes)
-        return max(1, len(Metric.filter_nodes_on_upos(nodes, ['VERB']))) /\
-            max(1, len(Metric.filter_nodes_on_upos(nodes, ['VERB', 'ADJ'])))
+        verbs = adjectives = 0
+        for node in get_cached_nodes(doc, False):
+            if node.upos == UPOS_VERB:
+                verbs += 1
+            elif node.upos == UPOS_ADJ:
+                adjectives += 1
+        return max(1, verbs) / max(1, verbs + adjectives)
 
 
 class MetricHPoint(MetricPunctExcluding):
@@ -240,16 +292,15 @@ class MetricHPoint(MetricPunctExcluding):
     def apply(self, doc: Document) -> float:
         counts = list(self.get_word_counts(self.get_applicable_nodes(doc), self.use_lemma).values())
         counts.sort(reverse=True)
-        for i in range(len(counts)):
-            if i + 1 == counts[i]:
-                return counts[i]
-            if i + 1 > counts[i]:
-                i = i - 1
-                j = i + 1
-                fi = counts[i]
-                fj = counts[j]
-                return (fi * j - fj * i) / (j - i + fi - fj)
-        return 0
+        # counts[i] - (i + 1) is non-increasing, so the crossover rank can be bisected
+        crossover = bisect_left(range(len(counts)), True, key=lambda i: counts[i] <= i + 1)
+        if crossover == len(counts):
+            return 0
+        if counts[crossover] == crossover + 1:
+            return counts[crossover]
+        i, j = crossover - 1, crossover
+        fi, fj = counts[i], counts[j]
+        return (fi * j - fj * i) / (j - i + fi - fj)
 
 
 class MetricAverageTokenLength(MetricPunctExcluding):
@@ -260,9 +311,8 @@ class MetricAverageTokenLength(MetricPunctExcluding):
 
 
     def apply(self, doc: Document) -> float:
-        total_tokens = MetricWordCount(filter_punct=self.filter_punct).apply(doc)
-        total_chars = MetricCharacterCount(filter_punct=self.filter_punct).apply(doc)
-        return total_chars / total_tokens
+        nodes = self.get_applicable_nodes(doc)
+        return sum(len(node.form) for node in nodes) / len(nodes)
 
 
 class MetricMovingAverageTypeTokenRatio(MetricPunctExcluding):
@@ -277,14 +327,23 @@ class MetricMovingAverageTypeTokenRatio(MetricPunctExcluding):
     def apply(self, doc: Document) -> float:
         # FIXME: this is horribly slow
         # FIXEDME: this is now less slow
-        total_words = MetricWordCount(filter_punct=self.filter_punct).apply(doc)
+        # FIXEDMEMORE: the window now slides incrementally, O(N) instead of O(N * window_size)
+        total_words = count_words(doc, self.filter_punct)
         big_sum = 0
         filtered_nodes = self.get_applicable_nodes(doc)
         filtered_texts = self.get_node_texts(filtered_nodes, self.use_lemma)
 
-        for i in range(int(total_words) - self.window_size):
-            counts = set(filtered_texts[i:i+self.window_size])
-            big_sum += len(counts)
+        if (window_count := int(total_words) - self.window_size) > 0:
+            window = Counter(filtered_texts[:self.window_size])
+            big_sum = len(window)
+
+            for i in range(1, window_count):
+                leaving, entering = filtered_texts[i - 1], filtered_texts[i + self.window_size - 1]
+                window[leaving] -= 1
+                if not window[leaving]:
+                    del window[leaving]
+                window[entering] += 1
+                big_sum += len(window)
 
         return big_sum / (self.window_size * (total_words - self.window_size + 1))
 
@@ -326,9 +385,9 @@ class MetricFleschReadingEase(MetricPunctExcluding):
     const_1: float = 206.935
 
     def apply(self, doc: Document) -> float:
-        sents = MetricSentenceCount().apply(doc)
-        words = MetricWordCount(filter_punct=self.filter_punct).apply(doc)
-        syllabs = MetricSyllableCount(filter_punct=self.filter_punct).apply(doc)
+        sents = count_sentences(doc)
+        words = count_words(doc, self.filter_punct)
+        syllabs = count_syllables(doc, self.filter_punct)
         return self.const_1 - self.coef_1 * (words / sents) - self.coef_2 * (syllabs / words)
 
 
@@ -351,12 +410,17 @@ class MetricFleschKincaidGradeLevel(MetricPunctExcluding):
     const_1: float = 16.393
 
     def apply(self, doc: Document) -> float:
-        sents = MetricSentenceCount().apply(doc)
-        words = MetricWordCount(filter_punct=self.filter_punct).apply(doc)
-        syllabs = MetricSyllableCount(filter_punct=self.filter_punct).apply(doc)
+        sents = count_sentences(doc)
+        words = count_words(doc, self.filter_punct)
+        syllabs = count_syllables(doc, self.filter_punct)
         return self.coef_1 * (words / sents) + self.coef_2 * (syllabs / words) - self.const_1
 
 
+@lru_cache(maxsize=None)
+def _syllables_in_word_cached(word: str) -> int:
+    return Metric.get_syllables_in_word(word)
+
+
 class PolysyllabicMetric(MetricPunctExcluding):
     """
     A base class for metrics utilizing a threshold of syllabic length.
@@ -364,7 +428,8 @@ class PolysyllabicMetric(MetricPunctExcluding):
     syllab_threshold: int = 3
 
     def _is_word_complex(self, word: str):
-        return Metric.get_syllables_in_word(word) > self.syllab_threshold
+        # word forms repeat a lot (Zipf), so cache the syllable count per unique form
+        return _syllables_in_word_cached(word) > self.syllab_threshold
 
 
 class MetricGunningFog(PolysyllabicMetric):
@@ -384,9 +449,9 @@ class MetricGunningFog(PolysyllabicMetric):
     coef_2: float = 100
 
     def apply(self, doc: Document) -> float:
-        sents = MetricSentenceCount().apply(doc)
-        words = MetricWordCount(filter_punct=self.filter_punct).apply(doc)
-        complex_words = len([node for node in doc.nodes if self._is_word_complex(node.form)])
+        sents = count_sentences(doc)
+        words = count_words(doc, self.filter_punct)
+        complex_words = len([node for node in get_cached_nodes(doc, False) if self._is_word_complex(node.form)])
         return self.coef_1 * ((words/sents) + self.coef_2 * (complex_words/words))
 
 
@@ -409,7 +474,7 @@ class MetricSMOG(PolysyllabicMetric):
     const_1: float = 3.1291
 
     def apply(self, doc: Document) -> float:
-        sents = MetricSentenceCount().apply(doc)
+        sents = count_sentences(doc)
         complex_words = len([node for node in self.get_applicable_nodes(doc) if self._is_word_complex(node.form)])
         return self.coef_1 * sqrt(complex_words * 90) / sents + self.const_1
 
@@ -1,40 +1,80 @@
 from __future__ import annotations
 import util
 
+import sys
+
 from udapi.core.block import Block
 from udapi.core.node import Node
 from udapi.core.root import Root
 from udapi.core.document import Document
-from typing import Literal, Any, Union
+from typing import ClassVar, Literal, Any, Union
 
 from utils import StringBuildable
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 
-import os
+from itertools import count
 
 RULE_ANNOTATION_PREFIX = 'PonkApp1'
 
+# hot membership tests share these instead of rebuilding tuples per call
+OBJ_DEPRELS = frozenset(('obj', 'iobj'))
+VERBAL_UPOS = frozenset(('VERB', 'AUX'))
+CCONJ_DEPRELS = frozenset(('cc', 'punct'))
+PRONOMINAL_UPOS = frozenset(('PRON', 'DET'))
+ANAPHORIC_ADVERB_LEMMAS = frozenset(('vysoko', 'shora', 'právě'))
+
+# monotonic source of application ids; cheaper than os.urandom per application
+# and still unique within the process
+_application_ids = count()
+
 
 class Rule(StringBuildable):
+    # udeprels/lemmas the rule can possibly react to; None means the rule has to
+    # see every node (a rule declares at most one of the two trigger kinds)
+    interesting_udeprels: ClassVar[frozenset[str] | None] = None
+    interesting_lemmas: ClassVar[frozenset[str] | None] = None
+
     detect_only: bool = True
-    process_id: str = Field(default_factory=lambda: os.urandom(4).hex(), hidden=True)
-    modified_roots: set[Any] = Field(default=set(), hidden=True)  # FIXME: This should not be Any, but rather Root
-    application_count: int = Field(default=0, hidden=True)
+    # runtime state, not API parameters: private attrs skip the pydantic field
+    # machinery on every write and can't be injected through the API
+    _process_id: str = PrivateAttr(default='')
+    _modified_roots: set[Any] = PrivateAttr(default_factory=set)  # FIXME: This should not be Any, but rather Root
+    _application_count: int = PrivateAttr(default=0)
+    _key_base: str = ''
 
     def model_post_init(self, __context: Any) -> None:
-        self.process_id = Rule.get_application_id()
+        self._process_id = Rule.get_application_id()
+        self._refresh_key_base()
+
+    @property
+    def process_id(self) -> str:
+        return self._process_id
+
+    @property
+    def application_count(self) -> int:
+        return self._application_count
+
+    @property
+    def modified_roots(self) -> set[Any]:
+        return self._modified_roots
+
+    def _refresh_key_base(self):
+        # rebuilt only when process_id changes, so annotate_node doesn't have to;
+        # rule_id carries the same string as id() without the classmethod call
+        rule_id = getattr(self, 'rule_id', None) or type(self).__name__
+        self._key_base = f"{RULE_ANNOTATION_PREFIX}:{rule_id}:{self._process_id}"
 
     @staticmethod
     def get_application_id():
-        return os.urandom(4).hex()
+        return format(next(_application_ids), 'x')
 
     @classmethod
     def id(cls):
         return cls.__name__
 
     def annotate_node(self, annotation: str, *node: Node, flag: str | None = None):
-        key = f"{RULE_ANNOTATION_PREFIX}:{self.__class__.id()}:{self.process_id}"
+        key = self._key_base
         if flag:
             key += f":{flag}"
         value = annotation
@@ -42,6 +82,15 @@ class Rule(StringBuildable):
         for nd in node:
             nd.misc[key] = value
 
+    def annotate_nodes(self, **roles: Node):
+        """Annotate one node per role in a single call; role names become the values.
+
+        Equivalent to one annotate_node call per role, with the key built once.
+        """
+        key = self._key_base
+        for value, nd in roles.items():
+            nd.misc[key] = value
+
     def annotate_measurement(self, m_name: str, m_value, *node):
         self.annotate_node(str(m_value), *node, flag=f"measur:{m_name}")
 
@@ -51,13 +100,17 @@ class Rule(StringBuildable):
     def after_process_document(self, document):
         for root in self.modified_roots:
             root.text = root.compute_text()
+        if self.modified_roots:
+            # the tree changed under the memoized clauses
+            util.invalidate_clause_cache(document)
 
     def advance_application_id(self):
-        self.process_id = self.get_application_id()
-        self.application_count += 1
+        self._process_id = self.get_application_id()
+        self._application_count += 1
+        self._refresh_key_base()
 
     def reset_application_count(self):
-        self.application_count = 0
+        self._application_count = 0
 
     def process_node(self, node: Node):
         raise NotImplementedError('A rule is expected to have a \'process_node\' method.')
@@ -78,6 +131,7 @@ class RuleDoubleAdpos(Rule):
     """
 
     rule_id: Literal['RuleDoubleAdpos'] = 'RuleDoubleAdpos'
+    interesting_udeprels: ClassVar[frozenset[str] | None] = frozenset(('conj',))
     max_allowable_distance: int = 3
 
     def process_node(self, node: Node):
@@ -85,13 +139,26 @@ class RuleDoubleAdpos(Rule):
             return  # nothing we can do for this node, bail
 
         coord_el2 = node
+        coord_el2_case = coord_el2.feats['Case']
+
+        # the children facts don't depend on the adposition candidate, collect them once
+        child_lemmas = set()
+        has_adpos = False
+        cconj = None
+        for child in coord_el2.children:
+            child_lemmas.add(child.lemma)
+            if child.upos == "ADP":
+                has_adpos = True
+            # last matching child wins, same as the original trailing [-1]
+            if child.deprel in CCONJ_DEPRELS and child.lemma != '.':
+                cconj = child
 
         # find an adposition present in the coordination
         for parent_adpos in [nd for nd in coord_el2.siblings if nd.udeprel == "case" and nd.upos == "ADP"]:
             coord_el1 = parent_adpos.parent
 
             # check that the two coordination elements have the same case
-            if coord_el2.feats["Case"] != coord_el1.feats["Case"]:
+            if coord_el2_case != coord_el1.feats["Case"]:
                 continue
 
             # check that the two coordination elements aren't too close to each-other
@@ -99,33 +166,17 @@ class RuleDoubleAdpos(Rule):
                 continue
 
             # check that the second coordination element doesn't already have an adposition
-            if not [nd for nd in coord_el2.children if nd.lemma == parent_adpos.lemma] and not [
-                nd for nd in coord_el2.children if nd.upos == "ADP"
-            ]:
-                cconj = ([None] + [c for c in coord_el2.children if c.deprel in ('cc', 'punct') and c.lemma != '.'])[-1]
-
+            if parent_adpos.lemma not in child_lemmas and not has_adpos:
                 if not self.detect_only:
-                    correction = util.clone_node(
-                        parent_adpos,
-                        coord_el2,
-                        filter_misc_keys=r"^(?!Rule).*",
-                        include_subtree=True,
-                    )
-
-                    correction.form = parent_adpos.form.lower()
-                    if cconj:
-                        correction.shift_after_subtree(cconj)
-                    else:
-                        correction.shift_before_node(coord_el2.descendants(add_self=True)[0])
+                    correction = self._apply_correction(parent_adpos, coord_el2, cconj)
 
-                    for node_to_annotate in correction.descendants(add_self=True):
-                        self.annotate_node('add', node_to_annotate)
+                    # the correction became a child of coord_el2; keep the hoisted facts honest
+                    child_lemmas.add(correction.lemma)
+                    has_adpos = True
 
                 if cconj:
                     self.annotate_node('cconj', cconj)
-                self.annotate_node('orig_adpos', parent_adpos)
-                self.annotate_node('coord_el1', coord_el1)
-                self.annotate_node('coord_el2', coord_el2)
+                self.annotate_nodes(orig_adpos=parent_adpos, coord_el1=coord_el1, coord_el2=coord_el2)
 
                 self.annotate_measurement('max_allowable_distance', dst, cconj, parent_adpos, coord_el1, coord_el2)
                 self.annotate_parameter(
@@ -137,6 +188,26 @@ class RuleDoubleAdpos(Rule):
                 if not self.detect_only:
                     self.modified_roots.add(cconj.root)
 
+    def _apply_correction(self, parent_adpos: Node, coord_el2: Node, cconj: Node | None) -> Node:
+        """Graft a copy of parent_adpos onto coord_el2; only reached in transform mode."""
+        correction = util.clone_node(
+            parent_adpos,
+            coord_el2,
+            filter_misc_keys=r"^(?!Rule).*",
+            include_subtree=True,
+        )
+
+        correction.form = parent_adpos.form.lower()
+        if cconj:
+            correction.shift_after_subtree(cconj)
+        else:
+            correction.shift_before_node(util.first_descendant(coord_el2))
+
+        for node_to_annotate in correction.descendants(add_self=True):
+            self.annotate_node('add', node_to_annotate)
+
+        return correction
+
 
 class RulePassive(Rule):
     """Capture be-passives.
@@ -145,13 +216,13 @@ class RulePassive(Rule):
     """
 
     rule_id: Literal['RulePassive'] = 'RulePassive'
+    interesting_udeprels: ClassVar[frozenset[str] | None] = frozenset(('aux',))
 
     def process_node(self, node):
         if node.deprel == 'aux:pass':
             parent = node.parent
 
-            self.annotate_node('aux', node)
-            self.annotate_node('participle', parent)
+            self.annotate_nodes(aux=node, participle=parent)
 
             self.advance_application_id()
 
@@ -171,23 +242,27 @@ class RulePredSubjDistance(Rule):
     """
 
     rule_id: Literal['RulePredSubjDistance'] = 'RulePredSubjDistance'
+    interesting_udeprels: ClassVar[frozenset[str] | None] = frozenset(('nsubj', 'csubj'))
     max_distance: int = 6
     include_clausal_subjects: bool = False
 
     def process_node(self, node):
-        if node.udeprel == 'nsubj' or (self.include_clausal_subjects and node.udeprel == 'csubj'):
+        # udeprel is a property that splits deprel on every read, so read it once
+        udeprel = node.udeprel
+        if udeprel == 'nsubj' or (self.include_clausal_subjects and udeprel == 'csubj'):
             # locate predicate
             pred = node.parent
 
             # if the predicate is analytic, select the (non-conditional) auxiliary or the copula
-            if finite_verbs := [
-                nd for nd in pred.children if nd.udeprel == 'cop' or (nd.udeprel == 'aux' and nd.feats['Mood'] != 'Cnd')
-            ]:
-                pred = finite_verbs[0]
+            if finite_verb := next(
+                (nd for nd in pred.children if nd.udeprel == 'cop' or (nd.udeprel == 'aux' and nd.feats['Mood'] != 'Cnd')),
+                None,
+            ):
+                pred = finite_verb
 
             # locate subject
             subj = node
-            if node.udeprel == 'csubj':
+            if udeprel == 'csubj':
                 clause = util.get_clause(node, without_subordinates=True, without_punctuation=True, node_is_root=True)
                 if node.ord < pred.ord:
                     subj = clause[-1]
@@ -195,8 +270,7 @@ class RulePredSubjDistance(Rule):
                     subj = clause[0]
 
             if (max_dst := abs(subj.ord - pred.ord)) > self.max_distance:
-                self.annotate_node('predicate_grammar', pred)
-                self.annotate_node('subject', subj)
+                self.annotate_nodes(predicate_grammar=pred, subject=subj)
 
                 self.annotate_measurement('max_distance', max_dst, pred, subj)
                 self.annotate_parameter('max_distance', self.max_distance, pred, subj)
@@ -218,15 +292,15 @@ class RulePredObjDistance(Rule):
     """
 
     rule_id: Literal['RulePredObjDistance'] = 'RulePredObjDistance'
+    interesting_udeprels: ClassVar[frozenset[str] | None] = frozenset(('obj', 'iobj'))
     max_distance: int = 6
 
     def process_node(self, node):
-        if node.deprel in ('obj', 'iobj'):
+        if node.deprel in OBJ_DEPRELS:
             parent = node.parent
 
             if (max_dst := abs(parent.ord - node.ord)) > self.max_distance:
-                self.annotate_node('object', node)
-                self.annotate_node('parent', parent)
+                self.annotate_nodes(object=node, parent=parent)
 
                 self.annotate_measurement('max_distance', max_dst, node, parent)
                 self.annotate_parameter('max_distance', self.max_distance, node, parent)
@@ -247,15 +321,11 @@ class RuleInfVerbDistance(Rule):
     max_distance: int = 5
 
     def process_node(self, node):
-        if (
-            'VerbForm' in node.feats
-            and (infinitive := node).feats['VerbForm'] == 'Inf'
-            and 'VerbForm' in (verb := infinitive.parent).feats
-        ):
+        # DualDict returns '' for missing keys, no need to check for presence first
+        if (infinitive := node).feats['VerbForm'] == 'Inf' and 'VerbForm' in (verb := infinitive.parent).feats:
 
             if (max_dst := abs(verb.ord - infinitive.ord)) > self.max_distance:
-                self.annotate_node('infinitive', infinitive)
-                self.annotate_node('verb', verb)
+                self.annotate_nodes(infinitive=infinitive, verb=verb)
 
                 self.annotate_measurement('max_distance', max_dst, infinitive, verb)
                 self.annotate_parameter('max_distance', self.max_distance, infinitive, verb)
@@ -276,30 +346,23 @@ class RuleMultiPartVerbs(Rule):
     """
 
     rule_id: Literal['RuleMultiPartVerbs'] = 'RuleMultiPartVerbs'
+    interesting_udeprels: ClassVar[frozenset[str] | None] = frozenset(('aux', 'expl', 'cop'))
     max_distance: int = 5
 
     def process_node(self, node):
         # if node is an auxiliary and hasn't been marked as such yet
-        if util.is_aux(node) and not {
-            k: v for k, v in node.misc.items() if k.split(':')[0] == self.rule_id and v == 'aux'
-        }:
+        if util.is_aux(node) and not any(
+            k.split(':')[0] == self.rule_id and v == 'aux' for k, v in node.misc.items()
+        ):
             parent = node.parent
 
-            # find remaining auxiliaries
-            auxiliaries = {node}
-            for child in parent.children:
-                if util.is_aux(child) and not child in auxiliaries:
-                    auxiliaries.add(child)
+            # find remaining auxiliaries; set construction deduplicates node itself
+            auxiliaries = {node, *(child for child in parent.children if util.is_aux(child))}
 
             # find if the verb is too spread out
-            too_far_apart = False
-            max_dst = 0
-            for aux in auxiliaries:
-                dst = abs(parent.ord - aux.ord)
-                max_dst = max(max_dst, dst)
-                too_far_apart |= dst > self.max_distance
-
-            if too_far_apart:
+            max_dst = max(abs(parent.ord - aux.ord) for aux in auxiliaries)
+
+            if max_dst > self.max_distance:
                 self.annotate_node('head', parent)
                 self.annotate_node('aux', *auxiliaries)
 
@@ -320,22 +383,26 @@ class RuleLongSentences(Rule):
     """
 
     rule_id: Literal['RuleLongSentences'] = 'RuleLongSentences'
+    interesting_udeprels: ClassVar[frozenset[str] | None] = frozenset(('root',))
     max_length: int = 50
     without_punctuation: bool = False
 
     def process_node(self, node):
         if node.udeprel == 'root':
-            descendants = util.get_clause(node, without_punctuation=self.without_punctuation, node_is_root=True)
+            if self.without_punctuation:
+                descendants = util.get_clause(node, without_punctuation=True, node_is_root=True)
 
-            if not descendants:
-                return
+                if not descendants:
+                    return
 
-            # len(descendants) always >= 1 when add_self == True
-            beginning, end = descendants[0], descendants[-1]
+                # len(descendants) always >= 1 when add_self == True
+                beginning, end = descendants[0], descendants[-1]
+            else:
+                # only the endpoints are needed, skip materializing the subtree
+                beginning, end = util.first_descendant(node), util.last_descendant(node)
 
             if (max_length := end.ord - beginning.ord) >= self.max_length:
-                self.annotate_node('beginning', beginning)
-                self.annotate_node('end', end)
+                self.annotate_nodes(beginning=beginning, end=end)
 
                 self.annotate_measurement('max_length', max_length, beginning, end)
                 self.annotate_parameter('max_length', self.max_length, beginning, end)
@@ -374,13 +441,12 @@ class RulePredAtClauseBeginning(Rule):
             first_predicate_token = predicate_tokens[0]
 
             # if first_predicate_token has already been annotated by this rule
-            if l := [k for k, _ in first_predicate_token.misc.items() if k.split(':')[0] == self.rule_id]:
+            if any(k.split(':')[0] == self.rule_id for k, _ in first_predicate_token.misc.items()):
                 return
 
             # add 1 to make the parameter 1-indexed instead of being 0-indexed
             if (max_ord := first_predicate_token.ord - clause_beginning.ord + 1) > self.max_order:
-                self.annotate_node('clause_beginning', clause_beginning)
-                self.annotate_node('predicate_beginning', first_predicate_token)
+                self.annotate_nodes(clause_beginning=clause_beginning, predicate_beginning=first_predicate_token)
 
                 self.annotate_measurement('max_order', max_ord, clause_beginning, first_predicate_token)
                 self.annotate_parameter('max_order', self.max_order, clause_beginning, first_predicate_token)
@@ -397,7 +463,7 @@ class RuleVerbalNouns(Rule):
     rule_id: Literal['RuleVerbalNouns'] = 'RuleVerbalNouns'
 
     def process_node(self, node):
-        if 'VerbForm' in node.feats and node.feats['VerbForm'] == 'Vnoun':
+        if node.feats['VerbForm'] == 'Vnoun':
             self.annotate_node('verbal_noun', node)
             self.advance_application_id()
 
@@ -414,11 +480,12 @@ class RuleTooFewVerbs(Rule):
     """
 
     rule_id: Literal['RuleTooFewVerbs'] = 'RuleTooFewVerbs'
+    interesting_udeprels: ClassVar[frozenset[str] | None] = frozenset(('root',))
     min_verb_frac: float = 0.05
     finite_only: bool = False
 
     def is_verb(self, node):
-        return util.is_finite_verb(node) if self.finite_only else node.upos in ('VERB', 'AUX')
+        return util.is_finite_verb(node) if self.finite_only else node.upos in VERBAL_UPOS
 
     def process_node(self, node):
         if node.udeprel == 'root':
@@ -427,23 +494,30 @@ class RuleTooFewVerbs(Rule):
             if not sentence:
                 return
 
-            # count each lexeme only once
-            verbs = [
-                nd
-                for nd in sentence
-                if self.is_verb(nd)
-                and not (
-                    util.is_aux(nd, grammatical_only=True)
-                    and (
-                        self.is_verb(nd.parent)
-                        or [
-                            preceding_nd
-                            for preceding_nd in nd.parent.descendants(preceding_only=True)
-                            if preceding_nd != nd and util.is_aux(preceding_nd, grammatical_only=True)
-                        ]
+            # auxiliaries of a multi-token predicate share the same parent, so the
+            # "does another grammatical aux precede the parent" subtree scan is
+            # counted once per parent instead of once per auxiliary
+            preceding_aux_counts: dict[int, int] = {}
+
+            def preceding_aux_count(parent: Node) -> int:
+                if (cnt := preceding_aux_counts.get(id(parent))) is None:
+                    cnt = sum(
+                        1 for nd in parent.descendants(preceding_only=True) if util.is_aux(nd, grammatical_only=True)
                     )
-                )
-            ]
+                    preceding_aux_counts[id(parent)] = cnt
+                return cnt
+
+            # count each lexeme only once
+            verbs = []
+            for nd in sentence:
+                if not self.is_verb(nd):
+                    continue
+                if util.is_aux(nd, grammatical_only=True):
+                    parent = nd.parent
+                    # discount nd itself when it precedes the parent
+                    if self.is_verb(parent) or preceding_aux_count(parent) - (nd.ord < parent.ord) >= 1:
+                        continue
+                verbs.append(nd)
 
             if (min_frac := len(verbs) / len(sentence)) < self.min_verb_frac:
                 self.annotate_node('verb', *verbs)
@@ -468,6 +542,7 @@ class RuleTooManyNegations(Rule):
     """
 
     rule_id: Literal['RuleTooManyNegations'] = 'RuleTooManyNegations'
+    interesting_udeprels: ClassVar[frozenset[str] | None] = frozenset(('root',))
     max_negation_frac: float = 0.1
     max_allowable_negations: int = 3
 
@@ -475,10 +550,17 @@ class RuleTooManyNegations(Rule):
         if node.udeprel == 'root':
             clause = util.get_clause(node, without_punctuation=True, node_is_root=True)
 
-            positives = [nd for nd in clause if 'Polarity' in nd.feats and nd.feats['Polarity'] == 'Pos']
-            negatives = [nd for nd in clause if 'Polarity' in nd.feats and nd.feats['Polarity'] == 'Neg']
+            # classify each node's polarity in a single clause traversal
+            no_pos = 0
+            negatives = []
+            for nd in clause:
+                polarity = nd.feats['Polarity']
+                if polarity == 'Neg':
+                    negatives.append(nd)
+                elif polarity == 'Pos':
+                    no_pos += 1
 
-            no_pos, no_neg = len(positives), len(negatives)
+            no_neg = len(negatives)
 
             if (
                 no_neg > self.max_allowable_negations
@@ -501,10 +583,15 @@ class RuleWeakMeaningWords(Rule):
     """
 
     rule_id: Literal['RuleWeakMeaningWords'] = 'RuleWeakMeaningWords'
-    _weak_meaning_words: list[str] = ['dopadat', 'zaměřit', 'poukázat', 'ovlivnit', 'postup', 'obdobně', 'velmi']
+    # interned so lemma equality can collapse to a pointer comparison; a ClassVar
+    # keeps pydantic from copying the set into every instance
+    _weak_meaning_words: ClassVar[frozenset[str]] = frozenset(
+        sys.intern(s) for s in ('dopadat', 'zaměřit', 'poukázat', 'ovlivnit', 'postup', 'obdobně', 'velmi')
+    )
+    interesting_lemmas: ClassVar[frozenset[str] | None] = _weak_meaning_words
 
     def process_node(self, node):
-        if node.lemma in self._weak_meaning_words:
+        if node.lemma in self.interesting_lemmas:
             self.annotate_node('weak_meaning_word', node)
             self.advance_application_id()
 
@@ -516,22 +603,26 @@ class RuleAbstractNouns(Rule):
     """
 
     rule_id: Literal['RuleAbstractNouns'] = 'RuleAbstractNouns'
-    _abstract_nouns: list[str] = [
-        'základ',
-        'situace',
-        'úvaha',
-        'charakter',
-        'stupeň',
-        'aspekt',
-        'okolnosti',
-        'událost',
-        'snaha',
-        'podmínky',
-        'činnost',
-    ]
+    _abstract_nouns: ClassVar[frozenset[str]] = frozenset(
+        sys.intern(s)
+        for s in (
+            'základ',
+            'situace',
+            'úvaha',
+            'charakter',
+            'stupeň',
+            'aspekt',
+            'okolnosti',
+            'událost',
+            'snaha',
+            'podmínky',
+            'činnost',
+        )
+    )
+    interesting_lemmas: ClassVar[frozenset[str] | None] = _abstract_nouns
 
     def process_node(self, node):
-        if node.lemma in self._abstract_nouns:
+        if node.lemma in self.interesting_lemmas:
             self.annotate_node('abstract_noun', node)
             self.advance_application_id()
 
@@ -545,27 +636,39 @@ class RuleRelativisticExpressions(Rule):
     rule_id: Literal['RuleRelativisticExpressions'] = 'RuleRelativisticExpressions'
 
     # lemmas; when space-separated, nodes next-to-each-other with corresponding lemmas are looked for
-    _expressions: list[list[str]] = [
-        expr.split(' ') for expr in ['poněkud', 'jevit', 'patrně', 'do jistý míra', 'snad', 'jaksi']
-    ]
+    _expressions: ClassVar[tuple[tuple[str, ...], ...]] = tuple(
+        tuple(sys.intern(lemma) for lemma in expr.split(' '))
+        for expr in ('poněkud', 'jevit', 'patrně', 'do jistý míra', 'snad', 'jaksi')
+    )
+    # expressions indexed by their first lemma; non-matching nodes bail out on one probe
+    _by_first_lemma: ClassVar[dict[str, list[tuple[str, ...]]]] = {}
+    for _expr in _expressions:
+        _by_first_lemma.setdefault(_expr[0], []).append(_expr)
+    del _expr
 
     def process_node(self, node):
-        for expr in self._expressions:
-            # node matches first lemma in the expression
-            if node.lemma.lower() == expr[0]:
-                nd_iterator, i = node, 0
-                nodes = [nd_iterator]
-
-                # see if next nodes match next lemmas in the expression
-                while (nd_iterator := nd_iterator.next_node) and (i := i + 1) < len(expr):
-                    if nd_iterator.lemma.lower() != expr[i]:
-                        break
-                    nodes += [nd_iterator]
-                # success listener
-                else:
-                    for matching_node in nodes:
-                        self.annotate_node('relativistic_expression', matching_node)
-                        self.advance_application_id()
+        if not (candidates := self._by_first_lemma.get(node.lemma.lower())):
+            return
+
+        for expr in candidates:
+            nd_iterator = node
+            nodes = [nd_iterator]
+            matched = True
+
+            # see if next nodes match next lemmas in the expression
+            for i in range(1, len(expr)):
+                if (nd_iterator := nd_iterator.next_node) is None:
+                    # end of document counts as a match of what was collected so far
+                    break
+                if nd_iterator.lemma.lower() != expr[i]:
+                    matched = False
+                    break
+                nodes.append(nd_iterator)
+
+            if matched:
+                for matching_node in nodes:
+                    self.annotate_node('relativistic_expression', matching_node)
+                    self.advance_application_id()
 
 
 class RuleConfirmationExpressions(Rule):
@@ -576,10 +679,13 @@ class RuleConfirmationExpressions(Rule):
     """
 
     rule_id: Literal['RuleConfirmationExpressions'] = 'RuleConfirmationExpressions'
-    _expressions: list[str] = ['jednoznačně', 'jasně', 'nepochybně', 'naprosto', 'rozhodně']
+    _expressions: ClassVar[frozenset[str]] = frozenset(
+        sys.intern(s) for s in ('jednoznačně', 'jasně', 'nepochybně', 'naprosto', 'rozhodně')
+    )
+    interesting_lemmas: ClassVar[frozenset[str] | None] = _expressions
 
     def process_node(self, node):
-        if node.lemma in self._expressions:
+        if node.lemma in self.interesting_lemmas:
             self.annotate_node('confirmation_expression', node)
 
 
@@ -591,71 +697,90 @@ class RuleRedundantExpressions(Rule):
 
     rule_id: Literal['RuleRedundantExpressions'] = 'RuleRedundantExpressions'
 
+    # lemma -> handler method; a hash probe instead of a match-statement chain
+    _dispatch: ClassVar[dict[str, str]] = {
+        'nutný': '_process_nutny',
+        'zřejmý': '_process_zrejmy',
+        'vyvstat': '_process_vyvstat',
+        'nabízet': '_process_nabizet',
+        'řada': '_process_rada',
+        'kontext': '_process_kontext',
+        'posuzování': '_process_posuzovani',
+    }
+    interesting_lemmas: ClassVar[frozenset[str] | None] = frozenset(_dispatch)
+
     def process_node(self, node):
-        match node.lemma:
-            # je nutné zdůraznit
-            case 'nutný':
-                if (aux := [c for c in node.children if c.lemma == 'být']) and (
-                    inf := [c for c in node.children if c.lemma == 'zdůraznit']
-                ):
-                    self.annotate_node('redundant_expression', node, aux[0], inf[0])
-                    self.advance_application_id()
+        if handler := self._dispatch.get(node.lemma):
+            getattr(self, handler)(node)
+
+    # je nutné zdůraznit
+    def _process_nutny(self, node):
+        children = node.children
+        if (aux := next((c for c in children if c.lemma == 'být'), None)) and (
+            inf := next((c for c in children if c.lemma == 'zdůraznit'), None)
+        ):
+            self.annotate_node('redundant_expression', node, aux, inf)
+            self.advance_application_id()
 
-            # z uvedeného je zřejmé
-            case 'zřejmý':
-                if (aux := [c for c in node.children if c.lemma == 'být']) and (
-                    adj := [
-                        c for c in node.children if c.lemma == 'uvedený' and [a for a in c.children if a.lemma == 'z']
-                    ]
-                ):
-                    # little dirty, I'd love to know if it's possible to retreive the adposition from the condition
-                    # without it possible being overwritten if there are multiple cs that match c.lemma == 'uvedený'
-                    adp = [a for a in adj[0].children if a.lemma == 'z']
-
-                    self.annotate_node('redundant_expression', node, aux[0], adj[0], adp[0])
-                    self.advance_application_id()
+    # z uvedeného je zřejmé
+    def _process_zrejmy(self, node):
+        children = node.children
+        if (aux := next((c for c in children if c.lemma == 'být'), None)) and (
+            adj := next(
+                (c for c in children if c.lemma == 'uvedený' and any(a.lemma == 'z' for a in c.children)), None
+            )
+        ):
+            # little dirty, I'd love to know if it's possible to retreive the adposition from the condition
+            # without it possible being overwritten if there are multiple cs that match c.lemma == 'uvedený'
+            adp = next(a for a in adj.children if a.lemma == 'z')
 
-            # vyvstala otázka
-            case 'vyvstat':
-                if noun := [c for c in node.children if c.lemma == 'otázka']:
-                    self.annotate_node('redundant_expression', node, noun[0])
-                    self.advance_application_id()
+            self.annotate_node('redundant_expression', node, aux, adj, adp)
+            self.advance_application_id()
 
-            # nabízí se otázka
-            case 'nabízet':
-                if (expl := [c for c in node.children if c.deprel == 'expl:pass']) and (
-                    noun := [c for c in node.children if c.lemma == 'otázka']
-                ):
-                    self.annotate_node('redundant_expression', node, expl[0], noun[0])
-                    self.advance_application_id()
+    # vyvstala otázka
+    def _process_vyvstat(self, node):
+        if noun := next((c for c in node.children if c.lemma == 'otázka'), None):
+            self.annotate_node('redundant_expression', node, noun)
+            self.advance_application_id()
 
-            # v neposlední řadě
-            case 'řada':
-                if (adj := [c for c in node.children if c.lemma == 'neposlední']) and (
-                    adp := [c for c in node.children if c.lemma == 'v']
-                ):
-                    self.annotate_node('redundant_expression', node, adj[0], adp[0])
-                    self.advance_application_id()
+    # nabízí se otázka
+    def _process_nabizet(self, node):
+        children = node.children
+        if (expl := next((c for c in children if c.deprel == 'expl:pass'), None)) and (
+            noun := next((c for c in children if c.lemma == 'otázka'), None)
+        ):
+            self.annotate_node('redundant_expression', node, expl, noun)
+            self.advance_application_id()
 
-            # v kontextu věci
-            case 'kontext':
-                if (noun := [c for c in node.children if c.lemma == 'věc']) and (
-                    adp := [c for c in node.children if c.lemma == 'v']
-                ):
-                    self.annotate_node('redundant_expression', node, noun[0], adp[0])
-                    self.advance_application_id()
+    # v neposlední řadě
+    def _process_rada(self, node):
+        children = node.children
+        if (adj := next((c for c in children if c.lemma == 'neposlední'), None)) and (
+            adp := next((c for c in children if c.lemma == 'v'), None)
+        ):
+            self.annotate_node('redundant_expression', node, adj, adp)
+            self.advance_application_id()
+
+    # v kontextu věci
+    def _process_kontext(self, node):
+        children = node.children
+        if (noun := next((c for c in children if c.lemma == 'věc'), None)) and (
+            adp := next((c for c in children if c.lemma == 'v'), None)
+        ):
+            self.annotate_node('redundant_expression', node, noun, adp)
+            self.advance_application_id()
 
-            # v rámci posuzování
-            case 'posuzování':
-                if adp := [
-                    c for c in node.children if c.lemma == 'v' and [n for n in c.children if n.lemma == 'rámec']
-                ]:
-                    # little dirty, I'd love to know if it's possible to retreive the noun from the condition
-                    # without it possible being overwritten if there are multiple cs that match c.lemma == 'v'
-                    noun = [n for n in adp[0].children if n.lemma == 'rámec']
+    # v rámci posuzování
+    def _process_posuzovani(self, node):
+        if adp := next(
+            (c for c in node.children if c.lemma == 'v' and any(n.lemma == 'rámec' for n in c.children)), None
+        ):
+            # little dirty, I'd love to know if it's possible to retreive the noun from the condition
+            # without it possible being overwritten if there are multiple cs that match c.lemma == 'v'
+            noun = next(n for n in adp.children if n.lemma == 'rámec')
 
-                    self.annotate_node('redundant_expression', node, adp[0], noun[0])
-                    self.advance_application_id()
+            self.annotate_node('redundant_expression', node, adp, noun)
+            self.advance_application_id()
 
 
 class RuleTooLongExpressions(Rule):
@@ -666,34 +791,45 @@ class RuleTooLongExpressions(Rule):
 
     rule_id: Literal['RuleTooLongExpressions'] = 'RuleTooLongExpressions'
 
+    _dispatch: ClassVar[dict[str, str]] = {
+        'důsledek': '_process_dusledek',
+        'že': '_process_ze',
+        'týkající': '_process_tykajici',
+        'účel': '_process_ucel',
+    }
+    interesting_lemmas: ClassVar[frozenset[str] | None] = frozenset(_dispatch)
+
     def process_node(self, node):
-        match node.lemma:
-            # v důsledku toho
-            case 'důsledek':
-                if (adp := node.parent).lemma == 'v' and adp.parent and (pron := adp.parent).upos in ('PRON', 'DET'):
-                    self.annotate_node('too_long_expression', node, adp, pron)
-                    self.advance_application_id()
+        if handler := self._dispatch.get(node.lemma):
+            getattr(self, handler)(node)
 
-            # v případě, že
-            case 'že':
-                if (
-                    node.parent.parent
-                    and (noun := node.parent.parent).lemma == 'případ'
-                    and (adp := [c for c in noun.children if c.lemma == 'v'])
-                ):
-                    self.annotate_node('too_long_expression', node, noun, adp[0])
-                    self.advance_application_id()
-            # týkající se
-            case 'týkající':
-                if expl := [c for c in node.children if c.deprel == 'expl:pv']:
-                    self.annotate_node('too_long_expression', node, expl[0])
-                    self.advance_application_id()
+    # v důsledku toho
+    def _process_dusledek(self, node):
+        if (adp := node.parent).lemma == 'v' and adp.parent and (pron := adp.parent).upos in PRONOMINAL_UPOS:
+            self.annotate_node('too_long_expression', node, adp, pron)
+            self.advance_application_id()
 
-            # za účelem
-            case 'účel':
-                if (adp := node.parent).lemma == 'za':
-                    self.annotate_node('too_long_expression', node, adp)
-                    self.advance_application_id()
+    # v případě, že
+    def _process_ze(self, node):
+        if (
+            node.parent.parent
+            and (noun := node.parent.parent).lemma == 'případ'
+            and (adp := next((c for c in noun.children if c.lemma == 'v'), None))
+        ):
+            self.annotate_node('too_long_expression', node, noun, adp)
+            self.advance_application_id()
+
+    # týkající se
+    def _process_tykajici(self, node):
+        if expl := next((c for c in node.children if c.deprel == 'expl:pv'), None):
+            self.annotate_node('too_long_expression', node, expl)
+            self.advance_application_id()
+
+    # za účelem
+    def _process_ucel(self, node):
+        if (adp := node.parent).lemma == 'za':
+            self.annotate_node('too_long_expression', node, adp)
+            self.advance_application_id()
 
 
 class RuleAnaphoricReferences(Rule):
@@ -704,35 +840,59 @@ class RuleAnaphoricReferences(Rule):
 
     rule_id: Literal['RuleAnaphoricReferences'] = 'RuleAnaphoricReferences'
 
+    _dispatch: ClassVar[dict[str, str]] = {
+        'uvedený': '_process_uvedeny',
+        'skutečnost': '_process_skutecnost',
+        'logika': '_process_logika',
+    }
+    interesting_lemmas: ClassVar[frozenset[str] | None] = frozenset(_dispatch)
+
     def process_node(self, node):
-        match node.lemma:
-            # co se týče výše uvedeného
-            # ze shora uvedeného důvodu
-            # z právě uvedeného je zřejmé
-            case 'uvedený':
-                if adv := [c for c in node.children if c.lemma in ('vysoko', 'shora', 'právě')]:
-                    self.annotate_node('anaphoric_reference', node, *adv)
-                    self.advance_application_id()
+        if handler := self._dispatch.get(node.lemma):
+            getattr(self, handler)(node)
+
+    # co se týče výše uvedeného
+    # ze shora uvedeného důvodu
+    # z právě uvedeného je zřejmé
+    def _process_uvedeny(self, node):
+        if adv := [c for c in node.children if c.lemma in ANAPHORIC_ADVERB_LEMMAS]:
+            self.annotate_node('anaphoric_reference', node, *adv)
+            self.advance_application_id()
 
-            # s ohledem na tuto skutečnost
-            case 'skutečnost':
-                if (det := [c for c in node.children if c.udeprel == 'det' and c.feats['PronType'] == 'Dem']) and (
-                    adp := [c for c in node.children if c.udeprel == 'case']
-                ):
-                    self.annotate_node(
-                        'anaphoric_reference', node, *det, *adp, *[desc for a in adp for desc in a.descendants()]
-                    )
-                    self.advance_application_id()
+    # s ohledem na tuto skutečnost
+    def _process_skutecnost(self, node):
+        # both buckets are needed in full, so classify the children in one pass
+        det = []
+        adp = []
+        for c in node.children:
+            udeprel = c.udeprel
+            if udeprel == 'det' and c.feats['PronType'] == 'Dem':
+                det.append(c)
+            elif udeprel == 'case':
+                adp.append(c)
+
+        if det and adp:
+            self.annotate_node(
+                'anaphoric_reference', node, *det, *adp, *[desc for a in adp for desc in a.descendants()]
+            )
+            self.advance_application_id()
 
-            # z logiky věci vyplývá
-            case 'logika':
-                if (noun := [c for c in node.children if c.lemma == 'věc']) and (
-                    adp := [c for c in node.children if c.lemma == 'z']
-                ):
-                    self.annotate_node(
-                        'anaphoric_reference', node, *noun, *adp, *[desc for a in adp for desc in a.descendants()]
-                    )
-                    self.advance_application_id()
+    # z logiky věci vyplývá
+    def _process_logika(self, node):
+        noun = []
+        adp = []
+        for c in node.children:
+            lemma = c.lemma
+            if lemma == 'věc':
+                noun.append(c)
+            elif lemma == 'z':
+                adp.append(c)
+
+        if noun and adp:
+            self.annotate_node(
+                'anaphoric_reference', node, *noun, *adp, *[desc for a in adp for desc in a.descendants()]
+            )
+            self.advance_application_id()
 
 
 class RuleAmbiguousRegards(Rule):
@@ -743,33 +903,35 @@ class RuleAmbiguousRegards(Rule):
     """
 
     rule_id: Literal['RuleAmbiguousRegards'] = 'RuleAmbiguousRegards'
+    interesting_lemmas: ClassVar[frozenset[str] | None] = frozenset(('než',))
 
     def process_node(self, node):
-        if (
-            (sconj := node).lemma == 'než'
-            and not util.is_clause_root(landmark := node.parent)
-            and not [c for c in landmark.children if c.udeprel == 'case']
-            and (comparative := landmark.parent)
-            and 'Degree' in comparative.feats
-            and comparative.feats['Degree'] == 'Cmp'
-            and comparative.parent
-        ):
-            # trajector should be a noun
-            # if comparative.upos == 'ADJ', its parent should be a noun
-            # otherwise it may be that comparative.parent is verbal; we try to find its object
-            trajector = (
-                comparative.parent
-                if comparative.upos == 'ADJ'
-                else ([c for c in comparative.parent.children if c.udeprel == 'obj'] + [None])[0]
-            )
-
-            if trajector and trajector.udeprel == 'obj':
-                self.annotate_node('sconj', sconj)
-                self.annotate_node('landmark', landmark)
-                self.annotate_node('comparative', comparative)
-                self.annotate_node('trajector', trajector)
+        # walk the parent chain once, bailing out as early as possible
+        if node.lemma != 'než':
+            return
+        landmark = node.parent
+        if util.is_clause_root(landmark) or any(c.udeprel == 'case' for c in landmark.children):
+            return
+        comparative = landmark.parent
+        if comparative is None or comparative.feats['Degree'] != 'Cmp':
+            return
+        grandparent = comparative.parent
+        if grandparent is None:
+            return
+
+        # trajector should be a noun
+        # if comparative.upos == 'ADJ', its parent should be a noun
+        # otherwise it may be that comparative.parent is verbal; we try to find its object
+        trajector = (
+            grandparent
+            if comparative.upos == 'ADJ'
+            else next((c for c in grandparent.children if c.udeprel == 'obj'), None)
+        )
+
+        if trajector and trajector.udeprel == 'obj':
+            self.annotate_nodes(sconj=node, landmark=landmark, comparative=comparative, trajector=trajector)
 
-                self.advance_application_id()
+            self.advance_application_id()
 
 
 class RuleBlockWrapper(Block):
@@ -784,5 +946,40 @@ class RuleBlockWrapper(Block):
         return self.rule.after_process_document(document)
 
 
+class RuleBatchBlockWrapper(Block):
+    """Run a batch of rules in a single pass over the document.
+
+    Rules declaring interesting_udeprels or interesting_lemmas are only
+    dispatched to nodes carrying one of those triggers; the rest see every
+    node, as with RuleBlockWrapper.
+    """
+
+    def __init__(self, rules: list[Rule]):
+        Block.__init__(self)
+        self.rules = rules
+        self.unconditional_rules = [
+            rule for rule in rules if rule.interesting_udeprels is None and rule.interesting_lemmas is None
+        ]
+        self.rules_by_udeprel: dict[str, list[Rule]] = {}
+        self.rules_by_lemma: dict[str, list[Rule]] = {}
+        for rule in rules:
+            for udeprel in rule.interesting_udeprels or ():
+                self.rules_by_udeprel.setdefault(udeprel, []).append(rule)
+            for lemma in rule.interesting_lemmas or ():
+                self.rules_by_lemma.setdefault(lemma, []).append(rule)
+
+    def process_node(self, node: Node):
+        for rule in self.unconditional_rules:
+            rule.process_node(node)
+        for rule in self.rules_by_udeprel.get(node.udeprel, ()):
+            rule.process_node(node)
+        for rule in self.rules_by_lemma.get(node.lemma, ()):
+            rule.process_node(node)
+
+    def after_process_document(self, document: Document):
+        for rule in self.rules:
+            rule.after_process_document(document)
+
+
 class RuleAPIWrapper(BaseModel):
     rule: Union[*Rule.get_final_children()] = Field(..., discriminator='rule_id')  # type: ignore
@@ -6,12 +6,17 @@ from io import FileIO, TextIOWrapper
 
 from metrics import Metric, MetricsWrapper
 
-from rules import Rule, RuleBlockWrapper, RuleAPIWrapper
+from rules import Rule, RuleBatchBlockWrapper, RuleAPIWrapper
 
 from pydantic import BaseModel, Field
 
 from utils import MINIMAL_CONLLU
 
+# resolved once at import: the sets of concrete Rule/Metric classes are fixed
+# for the lifetime of the process (the API wrappers freeze their Unions anyway)
+RULE_CLASSES = Rule.get_final_children()
+METRIC_CLASSES = Metric.get_final_children()
+
 app = FastAPI(
     title='PONK Rules',
     swagger_ui_parameters={"defaultModelsExpandDepth": 0},
@@ -44,14 +49,13 @@ def compute_metrics(metric_list: list[MetricsWrapper] | None, doc: Document) ->
     if metric_list is None:
         # return all available metrics
         return [{instance.metric_id: instance.apply(doc)} for instance in
-                [subclass() for subclass in Metric.get_final_children()]]
+                [subclass() for subclass in METRIC_CLASSES]]
     return [{metric.metric_id: metric.apply(doc)} for metric in [x.metric for x in metric_list]]
 
 
 def apply_rules(rule_list: list[RuleAPIWrapper] | None, doc: Document) -> str:
-    rules = [rule() for rule in Rule.get_final_children()] if rule_list is None else [item.rule for item in rule_list]
-    for rule in rules:
-        RuleBlockWrapper(rule).run(doc)
+    rules = [rule() for rule in RULE_CLASSES] if rule_list is None else [item.rule for item in rule_list]
+    RuleBatchBlockWrapper(rules).run(doc)
     return doc.to_conllu_string()
 
 
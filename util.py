@@ -3,6 +3,20 @@ from udapi.core.dualdict import DualDict
 
 import re
 
+# clauses are memoized per document: several rules ask for the clause of the same
+# root while a document is processed; invalidated when a rule modifies the tree.
+# The cache is stored on the document itself — cached clause nodes reference their
+# document, so an external (weak-keyed) mapping would keep every document alive.
+
+
+def invalidate_clause_cache(document) -> None:
+    if hasattr(document, '_ponk_clause_cache'):
+        del document._ponk_clause_cache
+
+
+AUX_UDEPRELS = frozenset(('aux', 'expl', 'cop'))
+AUX_GRAMMATICAL_UDEPRELS = frozenset(('aux', 'cop'))
+
 
 def clone_node(
     node: Node, parent: Node, filter_misc_keys: str = None, include_subtree: bool = False, **override
@@ -34,19 +48,48 @@ def clone_node(
     return res
 
 
+def first_descendant(node: Node) -> Node:
+    """Return the word-order-wise first node of the subtree, the node itself included.
+
+    Unlike node.descendants(add_self=True)[0], this doesn't build and sort the full
+    subtree list. A plain scan is used so that non-projective subtrees stay correct.
+    """
+    first = node
+    stack = list(node.children)
+    while stack:
+        nd = stack.pop()
+        if nd.ord < first.ord:
+            first = nd
+        stack.extend(nd.children)
+    return first
+
+
+def last_descendant(node: Node) -> Node:
+    """Return the word-order-wise last node of the subtree, the node itself included."""
+    last = node
+    stack = list(node.children)
+    while stack:
+        nd = stack.pop()
+        if nd.ord > last.ord:
+            last = nd
+        stack.extend(nd.children)
+    return last
+
+
 def is_aux(node: Node, grammatical_only: bool = False) -> bool:
     if grammatical_only:
-        return node.udeprel in ('aux', 'cop') or node.deprel == 'expl:pass'
+        return node.udeprel in AUX_GRAMMATICAL_UDEPRELS or node.deprel == 'expl:pass'
     else:
-        return node.udeprel in ('aux', 'expl', 'cop')
+        return node.udeprel in AUX_UDEPRELS
 
 
 def is_finite_verb(node: Node) -> bool:
-    return ('VerbForm' in node.feats and node.feats['VerbForm'] == 'Fin') or node.xpos[0:2] == 'Vp'
+    # DualDict returns '' for missing keys, no separate presence check needed
+    return node.feats['VerbForm'] == 'Fin' or node.xpos[0:2] == 'Vp'
 
 
 def is_clause_root(node: Node) -> bool:
-    return is_finite_verb(node) or bool([nd for nd in node.children if is_aux(nd, grammatical_only=True)])
+    return is_finite_verb(node) or any(is_aux(nd, grammatical_only=True) for nd in node.children)
 
 
 def get_clause_root(node: Node) -> Node:
@@ -63,6 +106,14 @@ def get_clause(
     node_is_root: bool = False,
 ) -> list[Node]:
     clause_root = node if node_is_root else get_clause_root(node)
+
+    document = clause_root.root.document
+    if (doc_cache := getattr(document, '_ponk_clause_cache', None)) is None:
+        doc_cache = document._ponk_clause_cache = {}
+    cache_key = (id(clause_root), without_subordinates, without_punctuation)
+    if (cached := doc_cache.get(cache_key)) is not None:
+        return cached
+
     clause = clause_root.descendants(add_self=True)
 
     if without_subordinates:
@@ -79,4 +130,5 @@ def get_clause(
     if without_punctuation:
         clause = [nd for nd in clause if nd.upos != 'PUNCT']
 
+    doc_cache[cache_key] = clause
     return clause
@@ -1,6 +1,14 @@
+import re
+
+from collections import deque
+
 from pydantic import BaseModel
 from typing import Type
 
+# precompiled here so generate_doc_html doesn't recompile them per class
+_DOC_WHITESPACE_RE = re.compile(r'  +')
+_DOC_ATTR_TYPE_RE = re.compile(r' \([^)]+\): ')
+
 
 class StringBuildable(BaseModel):
     class Config:
@@ -13,18 +21,36 @@ class StringBuildable(BaseModel):
                     props[k] = v
             schema["properties"] = props
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # a new subclass anywhere in the tree can turn an ancestor's leaf into
+        # an inner node, so every cached leaf list up the chain is stale
+        for ancestor in cls.__mro__[1:]:
+            if '_final_children_cache' in ancestor.__dict__:
+                del ancestor._final_children_cache
+
     @classmethod
     def get_direct_children(cls) -> dict[str, type]:
         return {sub.id(): sub for sub in cls.__subclasses__()}
 
     @classmethod
     def get_final_children(cls) -> list[Type['StringBuildable']]:
-        children = cls.__subclasses__()
-        for child in children:
-            if child.__subclasses__():
-                children.remove(child)
-                children += child.__subclasses__()
-        return children
+        # BFS over the subclass tree; the result is cached until a new subclass appears
+        cache = cls.__dict__.get('_final_children_cache')
+        if cache is not None:
+            return cache
+
+        final_children = []
+        queue = deque(cls.__subclasses__())
+        while queue:
+            child = queue.popleft()
+            if subclasses := child.__subclasses__():
+                queue.extend(subclasses)
+            else:
+                final_children.append(child)
+
+        cls._final_children_cache = final_children
+        return final_children
 
 
 # might NOT be needed after all
@@ -51,47 +77,47 @@ class StringBuildable(BaseModel):
 
     @classmethod
     def generate_doc_html(cls):
-        html = f'<h1>{cls.__name__}</h1>'
-        html += f'<button id={cls.__name__}-button>Show</button>'
-        html += f'<div id={cls.__name__} style="display:none">'
+        # collect fragments and join once instead of growing the string repeatedly
+        html = [f'<h1>{cls.__name__}</h1>']
+        html.append(f'<button id={cls.__name__}-button>Show</button>')
+        html.append(f'<div id={cls.__name__} style="display:none">')
         for child in cls.get_final_children():
-            html += f'<h2>{child.__name__}</h2>'
-            html += f'<button id={child.__name__}-button>Show</button>'
+            html.append(f'<h2>{child.__name__}</h2>')
+            html.append(f'<button id={child.__name__}-button>Show</button>')
 
             docstring = child.__doc__
             attrs = None
             if 'Attributes:' in docstring:
-                import re
                 split_docstring = docstring.split('Attributes:')
                 docstring = split_docstring[0]
                 attrs = split_docstring[1].splitlines()
-                attrs = [re.sub(r'  +', ' ', attr).strip() for attr in attrs]
+                attrs = [_DOC_WHITESPACE_RE.sub(' ', attr).strip() for attr in attrs]
                 attrs = [attr for attr in attrs if attr != '']
-                attrs = [re.sub(r' \([^)]+\): ', ':', attr).split(':') for attr in attrs]
+                attrs = [_DOC_ATTR_TYPE_RE.sub(':', attr).split(':') for attr in attrs]
                 attrs = {attr[0]: attr[1] for attr in attrs}
 
-            html += (f'<div id={child.__name__} style="display:none">'
-                     f'{docstring.replace(chr(10), "<br>").replace("    ", "")}'
-                     )
-            html += f'<h4>Parameters</h4>'
-            html += f'<button id={child.__name__}-params-button>Show</button>'
-            html += f'<ul id={child.__name__}-params style="display:none">'
+            html.append(f'<div id={child.__name__} style="display:none">'
+                        f'{docstring.replace(chr(10), "<br>").replace("    ", "")}'
+                        )
+            html.append(f'<h4>Parameters</h4>')
+            html.append(f'<button id={child.__name__}-params-button>Show</button>')
+            html.append(f'<ul id={child.__name__}-params style="display:none">')
             for param in child.model_fields.items():
                 name = param[0]
                 field_info = param[1]
                 if field_info.json_schema_extra and field_info.json_schema_extra.get('hidden'):
                     continue
-                html += (f'<li><b>{name}</b>: '
-                         f'{field_info.annotation.__name__} '
-                         f'{" = " + str(field_info.default) if field_info.default is not None else ""} '
-                         f'{"<i>" + field_info.description + "</i>" if field_info.description else ""}'
-                         f'{"<i>" + attrs[name] + "</i>" if attrs and attrs.get(name) is not None else ""}'
-                         f'</li>')
-            html += '</ul>'
-            html += '</div>'
-
-        html += '</div>'
-        return html
+                html.append(f'<li><b>{name}</b>: '
+                            f'{field_info.annotation.__name__} '
+                            f'{" = " + str(field_info.default) if field_info.default is not None else ""} '
+                            f'{"<i>" + field_info.description + "</i>" if field_info.description else ""}'
+                            f'{"<i>" + attrs[name] + "</i>" if attrs and attrs.get(name) is not None else ""}'
+                            f'</li>')
+            html.append('</ul>')
+            html.append('</div>')
+
+        html.append('</div>')
+        return ''.join(html)
 
     @staticmethod
     def generate_doc_footer():